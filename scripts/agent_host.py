@@ -0,0 +1,282 @@
+"""
+Runs many submissions inside one Python process to cut the memory used per concurrent run.
+
+Every submission's mario_expert.py is loaded into its own module namespace and drives its own MarioController emulator,
+while numpy, cv2 and pyboy are only imported once. Each episode is stepped on its own thread - PyBoy ticks and the sleeps
+in choose_action release the GIL so the agents don't wait on each other - and each agent is isolated from the others:
+an exception or a step that runs past the timeout only stops that agent.
+
+A step that runs too long is interrupted by raising StepTimeout in its thread. That is only delivered between Python
+bytecodes, so a step stuck inside a single C call is stopped once the call returns.
+
+Only submissions whose requirements are already satisfied by this interpreter can be hosted, see requirements_compatible.
+"""
+
+import argparse
+import ctypes
+import importlib.metadata
+import importlib.util
+import logging
+import os
+import sys
+import threading
+import time
+
+import checkpoint
+
+logging.basicConfig(level=logging.INFO)
+
+
+# A BaseException so a submission's own "except Exception" can't swallow it
+class StepTimeout(BaseException):
+    pass
+
+
+def requirements_compatible(requirements_path: str) -> bool:
+    """
+    Returns True if every requirement in requirements_path is installed in this interpreter.
+
+    Only bare names and exact "==" pins are understood - anything else is treated as incompatible.
+    """
+    with open(requirements_path, "r", encoding="utf-8") as file:
+        lines = file.read().splitlines()
+
+    for line in lines:
+        requirement = line.split("#")[0].strip()
+        if not requirement:
+            continue
+
+        name, _, version = requirement.partition("==")
+        name = name.strip()
+        version = version.strip()
+        if any(c in name for c in "<>=!~;[ @") or requirement.startswith("-"):
+            return False
+
+        try:
+            installed = importlib.metadata.version(name)
+        except importlib.metadata.PackageNotFoundError:
+            return False
+
+        if version and installed != version:
+            return False
+
+    return True
+
+
+def load_expert_class(upi: str, expert_path: str):
+    """
+    Imports a submission's mario_expert.py under its own module name and returns its MarioExpert class.
+    """
+    module_name = f"mario_expert_{upi}"
+    spec = importlib.util.spec_from_file_location(module_name, expert_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module.MarioExpert
+
+
+class HostedAgent:
+    """
+    One submission being run by the host.
+
+    Args:
+        workspace (str): The submission workspace created by submission_sync.
+        checkpoint_interval (int): Steps between checkpoints.
+    """
+
+    def __init__(self, workspace: str, checkpoint_interval: int):
+        self.workspace = workspace
+        self.upi = os.path.basename(os.path.normpath(workspace))
+        self.results_path = f"{workspace}/results/{self.upi}"
+        self.sub_hash = checkpoint.submission_hash(
+            [f"{workspace}/requirements.txt", f"{workspace}/scripts/mario_expert.py"]
+        )
+        self.checkpoint_interval = checkpoint_interval
+
+        self.expert = None
+        self.episode = None
+        self.steps = 0
+        self.status = None
+
+        # Time spent in this agent's own steps, so the episode timeout doesn't depend on the other agents
+        self.step_time = 0.0
+
+        # Set while a step is running so the watchdog in host can interrupt it
+        self.lock = threading.Lock()
+        self.thread_id = None
+        self.step_started = None
+
+    def start(self) -> None:
+        os.makedirs(self.results_path, exist_ok=True)
+
+        expert_class = load_expert_class(self.upi, f"{self.workspace}/scripts/mario_expert.py")
+        self.expert = expert_class(results_path=self.results_path, headless=True)
+        self.episode = checkpoint.episode(
+            self.expert, self.results_path, self.checkpoint_interval, self.sub_hash
+        )
+
+    def step(self) -> bool:
+        """
+        Advances the episode by one step - returns False once the episode has finished.
+        """
+        try:
+            self.steps = next(self.episode)
+        except StopIteration:
+            return False
+        return True
+
+    def _timed(self, function):
+        started = time.monotonic()
+        with self.lock:
+            self.step_started = started
+        try:
+            return function()
+        finally:
+            with self.lock:
+                self.step_started = None
+            self.step_time += time.monotonic() - started
+
+    def run(self, episode_timeout: float) -> None:
+        """
+        Plays the whole episode - this is the body of the agent's thread.
+        """
+        self.thread_id = threading.get_ident()
+        try:
+            self._timed(self.start)
+
+            while self._timed(self.step):
+                if episode_timeout > 0 and self.step_time > episode_timeout:
+                    raise StepTimeout()
+
+            logging.info(f"{self.upi} finished after {self.steps} steps")
+            self.status = "finished"
+        except StepTimeout:
+            logging.error(f"{self.upi} timed out after {self.steps} steps")
+            self.status = "failed"
+        except Exception as error:  # pylint: disable=broad-except
+            logging.error(f"{self.upi} failed after {self.steps} steps: {error!r}")
+            self.status = "failed"
+        finally:
+            self.close()
+
+    def interrupt(self, step_timeout: float) -> None:
+        """
+        Raises StepTimeout in the agent's thread if its current step has run for longer than step_timeout.
+        """
+        with self.lock:
+            if self.step_started is None or time.monotonic() - self.step_started <= step_timeout:
+                return
+
+            # Only interrupt each step once
+            self.step_started = None
+            ctypes.pythonapi.PyThreadState_SetAsyncExc(
+                ctypes.c_ulong(self.thread_id), ctypes.py_object(StepTimeout)
+            )
+
+    def close(self) -> None:
+        # A failure while cleaning up only affects this agent, never the rest of the host
+        try:
+            self._close()
+        except (Exception, StepTimeout) as error:  # pylint: disable=broad-except
+            logging.error(f"Failed to close {self.upi}: {error!r}")
+            self.status = "failed"
+
+    def _close(self) -> None:
+        # Free the emulator straight away rather than holding it until the host exits
+        if self.expert is None:
+            return
+
+        video = getattr(self.expert, "video", None)
+        if video is not None:
+            video.release()
+
+        # Rollout workers each hold an emulator of their own
+        close_rollouts = getattr(self.expert.environment, "close_rollouts", None)
+        if close_rollouts is not None:
+            close_rollouts()
+
+        self.expert.environment.pyboy.stop(save=False)
+        self.expert = None
+        self.episode = None
+
+
+def host(
+    workspaces: list[str],
+    checkpoint_interval: int = 1000,
+    step_timeout: float = 10.0,
+    episode_timeout: float = 0.0,
+) -> dict[str, str]:
+    """
+    Plays every workspace's episode in this process, each on its own thread.
+
+    Returns {upi: "finished" | "skipped" | "failed"}.
+    """
+    status = {}
+    agents = []
+    for workspace in workspaces:
+        agent = HostedAgent(workspace, checkpoint_interval)
+
+        if checkpoint.has_final_results(agent.results_path, agent.sub_hash):
+            logging.info(f"Results for {agent.upi} are up to date - skipping")
+            status[agent.upi] = "skipped"
+            continue
+
+        agents.append(agent)
+
+    threads = [
+        threading.Thread(target=agent.run, args=(episode_timeout,), name=agent.upi)
+        for agent in agents
+    ]
+    for thread in threads:
+        thread.start()
+
+    # Watchdog for steps that run past the step timeout
+    while any(thread.is_alive() for thread in threads):
+        if step_timeout > 0:
+            for agent in agents:
+                agent.interrupt(step_timeout)
+        time.sleep(0.1)
+
+    for thread in threads:
+        thread.join()
+
+    for agent in agents:
+        status[agent.upi] = agent.status if agent.status is not None else "failed"
+
+    return status
+
+
+def get_args():
+    parse_args = argparse.ArgumentParser()
+
+    parse_args.add_argument("--workspaces", type=str, nargs="+", required=True)
+
+    parse_args.add_argument("--checkpoint_interval", type=int, default=1000)
+
+    # Seconds a single step may take before the agent is stopped - 0 disables the limit
+    parse_args.add_argument("--step_timeout", type=float, default=10.0)
+
+    # Seconds a whole episode may take before the agent is stopped - 0 disables the limit
+    parse_args.add_argument("--episode_timeout", type=float, default=0.0)
+
+    return parse_args.parse_args()
+
+
+def main():
+    args = get_args()
+
+    status = host(
+        args.workspaces,
+        checkpoint_interval=args.checkpoint_interval,
+        step_timeout=args.step_timeout,
+        episode_timeout=args.episode_timeout,
+    )
+
+    for upi, result in status.items():
+        logging.info(f"{upi}: {result}")
+
+    sys.exit(1 if "failed" in status.values() else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+Checkpointing for long running Mario Expert episodes.
+
+A checkpoint captures everything needed to continue an episode after a crash or kill:
+
+- the emulator state (via pyboy.save_state)
+- the number of steps taken so far
+- the completed video segments
+- the agent state (the picklable attributes of the expert and its environment)
+
+Checkpoints are written atomically into "{results_path}/checkpoint" so a crash part way through writing
+never corrupts the last good checkpoint.
+"""
+
+import glob
+import hashlib
+import io
+import json
+import logging
+import os
+import pickle
+import shutil
+
+CHECKPOINT_DIRECTORY = "checkpoint"
+CHECKPOINT_FILE = "checkpoint.json"
+
+# Attributes that hold live resources and can't be (or must not be) pickled
+EXPERT_EXCLUDE = ("environment", "video")
+ENVIRONMENT_EXCLUDE = ("pyboy", "screen", "rollout_pool")
+
+
+def submission_hash(paths: list[str]) -> str:
+    """
+    Hashes the contents of the given submission files so results can be matched to the submission that produced them.
+    """
+    sha = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as file:
+            sha.update(file.read())
+    return sha.hexdigest()
+
+
+def has_final_results(results_path: str, sub_hash: str) -> bool:
+    """
+    Returns True if results_path already holds a final results.json produced by the submission with sub_hash.
+    """
+    results_file = f"{results_path}/results.json"
+    if not os.path.exists(results_file):
+        return False
+
+    try:
+        with open(results_file, "r", encoding="utf-8") as file:
+            result = json.load(file)
+    except (OSError, json.JSONDecodeError):
+        return False
+
+    return result.get("submission_hash") == sub_hash
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+def _picklable_state(obj, exclude) -> dict:
+    state = {}
+    for key, value in vars(obj).items():
+        if key in exclude:
+            continue
+        try:
+            pickle.dumps(value)
+        except Exception:  # pylint: disable=broad-except
+            logging.warning(f"Skipping unpicklable attribute in checkpoint: {key}")
+            continue
+        state[key] = value
+    return state
+
+
+class Checkpointer:
+    """
+    Writes and restores checkpoints for a single episode.
+
+    Args:
+        results_path (str): The results directory for the episode.
+        sub_hash (str, optional): The hash of the submission being run - checkpoints from other submissions are ignored.
+    """
+
+    def __init__(self, results_path: str, sub_hash: str = None):
+        self.results_path = results_path
+        self.sub_hash = sub_hash
+        self.checkpoint_path = f"{results_path}/{CHECKPOINT_DIRECTORY}"
+
+    def segment_path(self, segment: int) -> str:
+        return f"{self.checkpoint_path}/segment_{segment:04d}.mp4"
+
+    def save(self, expert, steps: int, segment: int) -> None:
+        """
+        Saves the emulator, agent and step counter - segment is the index of the next (not yet written) video segment.
+        """
+        os.makedirs(self.checkpoint_path, exist_ok=True)
+
+        environment = expert.environment
+
+        state = io.BytesIO()
+        environment.pyboy.save_state(state)
+        # The step count is in the file name so the metadata only ever points at a fully written state
+        state_name = f"emulator_{steps}.state"
+        _atomic_write(f"{self.checkpoint_path}/{state_name}", state.getvalue())
+
+        agent_state = {
+            "expert": _picklable_state(expert, EXPERT_EXCLUDE),
+            "environment": _picklable_state(environment, ENVIRONMENT_EXCLUDE),
+        }
+        agent_name = f"agent_{steps}.pkl"
+        _atomic_write(f"{self.checkpoint_path}/{agent_name}", pickle.dumps(agent_state))
+
+        metadata = {
+            "steps": steps,
+            "segment": segment,
+            "emulator_state": state_name,
+            "agent_state": agent_name,
+            "submission_hash": self.sub_hash,
+        }
+        _atomic_write(
+            f"{self.checkpoint_path}/{CHECKPOINT_FILE}",
+            json.dumps(metadata).encode("utf-8"),
+        )
+
+        # Only remove the previous checkpoint once the new one is in place
+        for path in glob.glob(f"{self.checkpoint_path}/emulator_*.state") + glob.glob(
+            f"{self.checkpoint_path}/agent_*.pkl"
+        ):
+            if os.path.basename(path) not in (state_name, agent_name):
+                os.remove(path)
+
+        logging.info(f"Checkpoint saved at step {steps}")
+
+    def load(self) -> dict:
+        """
+        Returns the metadata of the last checkpoint, or None if there is no usable checkpoint.
+        """
+        checkpoint_file = f"{self.checkpoint_path}/{CHECKPOINT_FILE}"
+        if not os.path.exists(checkpoint_file):
+            return None
+
+        try:
+            with open(checkpoint_file, "r", encoding="utf-8") as file:
+                metadata = json.load(file)
+        except (OSError, json.JSONDecodeError):
+            logging.warning(f"Ignoring unreadable checkpoint: {checkpoint_file}")
+            return None
+
+        if metadata.get("submission_hash") != self.sub_hash:
+            logging.info("Ignoring checkpoint from a different submission")
+            return None
+
+        return metadata
+
+    def restore(self, expert, metadata: dict) -> None:
+        """
+        Restores the emulator and agent state recorded in metadata into expert.
+        """
+        environment = expert.environment
+
+        with open(f"{self.checkpoint_path}/{metadata['emulator_state']}", "rb") as file:
+            environment.pyboy.load_state(file)
+
+        with open(f"{self.checkpoint_path}/{metadata['agent_state']}", "rb") as file:
+            agent_state = pickle.load(file)
+
+        vars(expert).update(agent_state["expert"])
+        vars(environment).update(agent_state["environment"])
+        environment.invalidate_game_area()
+
+        logging.info(f"Resumed from checkpoint at step {metadata['steps']}")
+
+    def merge_segments(self, video_name: str, segments: int, fps: int = 30) -> None:
+        """
+        Joins the first `segments` video segments into a single video - segments that were never written are skipped.
+        """
+        written = [
+            self.segment_path(segment)
+            for segment in range(segments)
+            if os.path.exists(self.segment_path(segment))
+        ]
+        if not written:
+            return
+
+        # Imported here so the sync and host tooling can import this module without OpenCV installed
+        import cv2  # pylint: disable=import-outside-toplevel
+
+        video = None
+        for segment_path in written:
+            capture = cv2.VideoCapture(segment_path)
+            while True:
+                ok, frame = capture.read()
+                if not ok:
+                    break
+
+                if video is None:
+                    height, width, _ = frame.shape
+                    video = cv2.VideoWriter(
+                        video_name, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height)
+                    )
+                video.write(frame)
+            capture.release()
+
+        if video is not None:
+            video.release()
+
+    def clear(self) -> None:
+        shutil.rmtree(self.checkpoint_path, ignore_errors=True)
+
+
+def episode(expert, results_path: str, checkpoint_interval: int, sub_hash: str = None):
+    """
+    Runs the same evaluation loop as MarioExpert.play but writes a checkpoint every checkpoint_interval steps
+    and resumes from the last checkpoint in results_path if there is one.
+
+    This is a generator that yields the step count after every step so several episodes can be interleaved.
+    """
+    checkpointer = Checkpointer(results_path, sub_hash)
+    environment = expert.environment
+
+    environment.reset()
+
+    frame = environment.grab_frame()
+    height, width, _ = frame.shape
+
+    steps = 0
+    segment = 0
+
+    metadata = checkpointer.load()
+    if metadata is not None:
+        checkpointer.restore(expert, metadata)
+        steps = metadata["steps"]
+        segment = metadata["segment"]
+
+    os.makedirs(checkpointer.checkpoint_path, exist_ok=True)
+    expert.start_video(checkpointer.segment_path(segment), width, height)
+
+    while not environment.get_game_over():
+        frame = environment.grab_frame()
+        expert.video.write(frame)
+
+        expert.step()
+        steps += 1
+
+        if checkpoint_interval > 0 and steps % checkpoint_interval == 0:
+            # Close the segment so it is playable if the run dies before the next checkpoint
+            expert.stop_video()
+            segment += 1
+            checkpointer.save(expert, steps, segment)
+            expert.start_video(checkpointer.segment_path(segment), width, height)
+
+        yield steps
+
+    expert.stop_video()
+
+    final_stats = environment.game_state()
+    logging.info(f"Final Stats: {final_stats}")
+
+    checkpointer.merge_segments(f"{results_path}/mario_expert.mp4", segment + 1)
+
+    if sub_hash is not None:
+        final_stats["submission_hash"] = sub_hash
+
+    _atomic_write(
+        f"{results_path}/results.json", json.dumps(final_stats).encode("utf-8")
+    )
+
+    checkpointer.clear()
+
+
+def play(expert, results_path: str, checkpoint_interval: int, sub_hash: str = None) -> None:
+    """
+    Runs a whole checkpointed episode - see episode.
+    """
+    for _ in episode(expert, results_path, checkpoint_interval, sub_hash):
+        pass
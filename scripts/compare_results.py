@@ -1,35 +1,26 @@
 import argparse
-import glob
-import json
 import logging
-from functools import cmp_to_key
+
+from results_store import ResultsStore
 
 logging.basicConfig(level=logging.INFO)
 
 
-def compare_performance(results_one, results_two):
-    if results_one["world"] > results_two["world"]:
-        return -1
-    elif results_one["world"] < results_two["world"]:
-        return 1
+def get_args():
+    parse_args = argparse.ArgumentParser()
 
-    if results_one["stage"] > results_two["stage"]:
-        return -1
-    elif results_one["stage"] < results_two["stage"]:
-        return 1
+    parse_args.add_argument("-r", "--results_path", type=str, required=True)
 
-    if results_one["score"] > results_two["score"]:
-        return -1
-    elif results_one["score"] < results_two["score"]:
-        return 1
+    # Defaults to results.db inside the results path
+    parse_args.add_argument("-d", "--db_path", type=str, default=None)
 
-    return 0
+    parse_args.add_argument("--round", type=str, default="default")
 
+    # Rank across every round ingested so far rather than just --round
+    parse_args.add_argument("--all_rounds", action="store_true")
 
-def get_args():
-    parse_args = argparse.ArgumentParser()
-
-    parse_args.add_argument("-r", "--results_path", type=str, required=True)
+    # Summarise all episodes per UPI rather than ranking by the best episode
+    parse_args.add_argument("--aggregate", action="store_true")
 
     return parse_args.parse_args()
 
@@ -38,30 +29,31 @@ def main():
     args = get_args()
 
     results_path = args.results_path
-
-    result_directories = glob.glob(f"{results_path}/*")
-    logging.info(f"Found {len(result_directories)} results directories")
-    logging.info(f"Results directories: {result_directories}")
+    db_path = args.db_path if args.db_path is not None else f"{results_path}/results.db"
 
     logging.info(f"Comparing results in {results_path}")
 
-    results = []
-    for result_directory in result_directories:
-        upi = result_directory.split("/")[-1]
-        logging.info(f"Reading results for UPI: {upi}")
+    store = ResultsStore(db_path)
 
-        with open(f"{result_directory}/results.json", "r", encoding="utf-8") as file:
-            result = json.load(file)
-            result["upi"] = upi
+    updated = store.ingest(results_path, args.round)
+    logging.info(f"Ingested {updated} new or changed results into {db_path}")
 
-            results.append(result)
+    round_name = None if args.all_rounds else args.round
 
-    results = sorted(results, key=cmp_to_key(compare_performance))
+    if args.aggregate:
+        for i, result in enumerate(store.aggregates(round_name)):
+            logging.info(
+                f"{i + 1}: {result['upi']} - Episodes: {result['episodes']} Rounds: {result['rounds']} "
+                f"Best World: {result['best_world']} Mean Score: {result['mean_score']:.1f} "
+                f"Min Score: {result['min_score']} Max Score: {result['max_score']}"
+            )
+    else:
+        for i, result in enumerate(store.ranking(round_name)):
+            logging.info(
+                f"Rank {i + 1}: {result['upi']} - World: {result['world']} Stage: {result['stage']} Score: {result['score']}"
+            )
 
-    for i, result in enumerate(results):
-        logging.info(
-            f"Rank {i + 1}: {result['upi']} - World: {result['world']} Stage: {result['stage']} Score: {result['score']}"
-        )
+    store.close()
 
 
 if __name__ == "__main__":
@@ -11,6 +11,15 @@ import numpy as np
 
 from pyboy_environment import PyboyEnvironment
 
+# Tile categories produced by the game wrapper's compressed mapping
+TILE_EMPTY = 0
+TILE_MARIO = 1
+TILE_COIN = 5
+TILE_BLOCK = 10
+TILE_PIPE = 14
+TILE_GOOMBA = 15
+TILE_FLY = 18
+
 
 class MarioEnvironment(PyboyEnvironment):
     """
@@ -36,6 +45,24 @@ class MarioEnvironment(PyboyEnvironment):
 
         self.act_freq = act_freq
 
+        # The compressed mapping is a tile -> category lookup table. It is set on the emulator once here rather
+        # than on every game_area call, and a second lookup table turns each category into a single bit so
+        # tile checks are bitmask tests: game_area_bits() & tile_mask(TILE_BLOCK, TILE_PIPE)
+        mario = self.pyboy.game_wrapper
+        mario.game_area_mapping(mario.mapping_compressed, 0)
+
+        categories = int(np.max(mario.mapping_compressed)) + 1
+        bits_type = np.uint32 if categories <= 32 else np.uint64
+        self.category_bits = np.left_shift(1, np.arange(categories)).astype(bits_type)
+
+        self._game_area_frame = None
+        self._game_area = None
+        self._game_area_bits = None
+
+    def reset(self) -> np.ndarray:
+        super().reset()
+        self.invalidate_game_area()
+
     def game_state(self) -> dict[str, any]:
         return {
             "lives": self.get_lives(),  # DO NOT REMOVE
@@ -61,9 +88,34 @@ class MarioEnvironment(PyboyEnvironment):
     # https://www.thegameisafootarcade.com/wp-content/uploads/2017/04/Super-Mario-Land-Game-Manual.pdf         #
     ############################################################################################################
     def game_area(self) -> np.ndarray:
-        mario = self.pyboy.game_wrapper
-        mario.game_area_mapping(mario.mapping_compressed, 0)
-        return mario.game_area()
+        # A fresh array like pyboy returns, so callers can still change it in place without touching the cache
+        self._update_game_area()
+        return self._game_area.copy()
+
+    def game_area_bits(self) -> np.ndarray:
+        self._update_game_area()
+        return self._game_area_bits
+
+    def tile_mask(self, *categories: int) -> int:
+        return int(np.bitwise_or.reduce(self.category_bits[list(categories)]))
+
+    def invalidate_game_area(self) -> None:
+        # Needed after pyboy.load_state as loading a state doesn't advance the frame count
+        self._game_area_frame = None
+
+    def _update_game_area(self) -> None:
+        # Only project the tilemap once per frame however many times it is read
+        frame = self.pyboy.frame_count
+        if frame == self._game_area_frame:
+            return
+
+        self._game_area = np.array(self.pyboy.game_wrapper.game_area())
+        self._game_area_bits = self.category_bits[self._game_area]
+        self._game_area_frame = frame
+
+        # game_area_bits is shared by every caller until the next frame so it must not be changed in place
+        self._game_area.flags.writeable = False
+        self._game_area_bits.flags.writeable = False
 
     def get_time(self):
         hundreds = self._read_m(0x9831)
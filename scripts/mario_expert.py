@@ -6,14 +6,25 @@ Your goal is to implement the functions and methods required to enable choose_ac
 Original Mario Manual: https://www.thegameisafootarcade.com/wp-content/uploads/2017/04/Super-Mario-Land-Game-Manual.pdf
 """
 
+import io
 import json
 import logging
 import random
 import time
 
 import cv2
-from mario_environment import MarioEnvironment
+from mario_environment import (
+    TILE_BLOCK,
+    TILE_COIN,
+    TILE_EMPTY,
+    TILE_FLY,
+    TILE_GOOMBA,
+    TILE_MARIO,
+    TILE_PIPE,
+    MarioEnvironment,
+)
 from pyboy.utils import WindowEvent
+from rollout import LIFE_LOST, OUTCOME_SIZE, RolloutPool, best_plan
 
 # Added libraries
 import numpy as np
@@ -28,6 +39,7 @@ class MarioController(MarioEnvironment):
         act_freq (int): The frequency at which actions are performed. Defaults to 10.
         emulation_speed (int): The speed of the game emulation. Defaults to 0.
         headless (bool): Whether to run the game in headless mode. Defaults to False.
+        rollout_workers (int): Worker emulators started by start_rollouts - 0 disables rollouts. Defaults to 2.
     """
 
     def __init__(
@@ -35,6 +47,7 @@ class MarioController(MarioEnvironment):
         act_freq: int = 10,
         emulation_speed: int = 0,
         headless: bool = False,
+        rollout_workers: int = 2,
     ) -> None:
         super().__init__(
             act_freq=act_freq,
@@ -66,6 +79,10 @@ class MarioController(MarioEnvironment):
         self.valid_actions = valid_actions
         self.release_button = release_button
 
+        # Kept small as the workers each hold their own emulator and agents may share a host
+        self.rollout_workers = rollout_workers
+        self.rollout_pool = None
+
     def run_action(self, action: int, freq) -> None:
         """
         This is a very basic example of how this function could be implemented
@@ -94,6 +111,37 @@ class MarioController(MarioEnvironment):
         if self.act_freq != 10:
             print("Frequency is now: " + str(self.act_freq))
 
+    def save_state_bytes(self) -> bytes:
+        state = io.BytesIO()
+        self.pyboy.save_state(state)
+        return state.getvalue()
+
+    def start_rollouts(self) -> None:
+        """
+        Starts the worker emulators and waits for them to load so the first decisions can use them.
+        """
+        if self.rollout_pool is None and self.rollout_workers > 0:
+            self.rollout_pool = RolloutPool(
+                self.valid_actions, self.release_button, workers=self.rollout_workers
+            )
+
+    def evaluate_plans(self, plans, deadline=None) -> np.ndarray:
+        """
+        Plays each candidate plan - a list of (action, frames) pairs - from the current state on the worker emulators.
+
+        Returns one [x progress, life lost, score delta] row per plan, NaN for plans not finished before the deadline
+        or for every plan if the rollouts haven't been started. See rollout.best_plan for picking between them.
+        """
+        if self.rollout_pool is None:
+            return np.full((len(plans), OUTCOME_SIZE), np.nan, dtype=np.float32)
+
+        return self.rollout_pool.evaluate(self.save_state_bytes(), plans, deadline)
+
+    def close_rollouts(self):
+        if self.rollout_pool is not None:
+            self.rollout_pool.close()
+            self.rollout_pool = None
+
         
        
 
@@ -121,14 +169,28 @@ class MarioExpert:
         self.initial_x_pos = self.environment.get_x_position()
 
         # Pre-defined sprite numbers based on pyboy documentation
-        self.mario_sprite = 1
-        self.goopher_sprite = 15
-        self.floor_sprite = 10
-        self.pipe_sprite = 14
-        self.block_sprite = 10
+        self.mario_sprite = TILE_MARIO
+        self.goopher_sprite = TILE_GOOMBA
+        self.floor_sprite = TILE_BLOCK
+        self.pipe_sprite = TILE_PIPE
+        self.block_sprite = TILE_BLOCK
+
+        # Bitmasks for testing tiles in environment.game_area_bits()
+        self.empty_mask = self.environment.tile_mask(TILE_EMPTY)
+        self.coin_mask = self.environment.tile_mask(TILE_COIN)
+        self.block_mask = self.environment.tile_mask(TILE_BLOCK)
+        self.pipe_mask = self.environment.tile_mask(TILE_PIPE)
+        self.fly_mask = self.environment.tile_mask(TILE_FLY)
 
         self.boolean_toggle = False
 
+        # Alternatives the rule based action is checked against, and the frames Mario keeps running right after each
+        # one so the rollout shows whether it gets him killed
+        self.rollout_actions = [2, 4, 0, 1]
+        self.rollout_frames = 60
+
+        self.environment.start_rollouts()
+
     '''
     def find_position(self, current_environment, sprite):
         Script to find the current location of Mario Sprite within the simplified game frame
@@ -152,7 +214,7 @@ class MarioExpert:
 
         return sprite_position
     '''
-    def find_position(self, current_environment, sprite):
+    def find_position(self, game_area_bits, sprite):
         '''
         Script to find the current location of Mario Sprite within the simplified game frame.
 
@@ -162,39 +224,29 @@ class MarioExpert:
 
         The potential search grid is 20 wide by 16 high.
         '''
-        current_environment = np.array(current_environment.game_area())
+        mask = self.environment.tile_mask(sprite)
 
-        rows, cols = current_environment.shape
+        # Reversed so the search runs from the bottom row up and right to left within a row
+        positions = np.argwhere(game_area_bits & mask)[::-1].tolist()
 
-        count = 0
-        sprite_position = None
+        if not positions:
+            return None, 0
 
+        if sprite == self.goopher_sprite:
+            return positions, len(positions)
 
-        # Single loop to find the sprite or floor gaps
-        for i in range(rows - 1, -1, -1):
-            for j in range(cols - 1, -1, -1):  # Iterate across all columns
-                if current_environment[i][j] == sprite:
-                    if sprite != self.goopher_sprite:
-                        if sprite == 0: # Checking for gap in floor
-                            if i != 15:
-                                return None, count 
-                            else:
-                                if current_environment[i, j-1] == 0 and current_environment[i, j-2] == 0:
-                                    return [i,j], 3
-                                else:
-                                    return [i,j], 2
-                        else:
-                            return [i, j], count  # Return immediately if Mario is found
-                    
-                    # Initialize sprite_position as a list if it is None
-                    if sprite_position is None:
-                        sprite_position = []
+        i, j = positions[0]
 
-                    # Append the position to sprite_position
-                    sprite_position.append([i, j])
-                    count += 1
+        if sprite == TILE_EMPTY: # Checking for gap in floor
+            if i != 15:
+                return None, 0
 
-        return sprite_position, count
+            if game_area_bits[i, j-1] & mask and game_area_bits[i, j-2] & mask:
+                return [i, j], 3
+
+            return [i, j], 2
+
+        return [i, j], 0  # Return immediately if Mario is found
 
     def choose_action(self):
         rate = 0.2
@@ -213,22 +265,20 @@ class MarioExpert:
         frame = self.environment.grab_frame()
         game_area = self.environment.game_area()
 
-        current_environment = self.environment.pyboy.game_wrapper
-        current_environment_arr = current_environment.game_area()
+        game_area_bits = self.environment.game_area_bits()
         
-        print(current_environment.game_area())
-        #print(current_environment)
+        print(game_area)
 
         # Locating Mario's position
-        mario_position, _ = self.find_position(current_environment, self.mario_sprite)
+        mario_position, _ = self.find_position(game_area_bits, self.mario_sprite)
 
-        #print("Mario's position: " + str(mario_position) + " In front of Mario: " + str(current_environment_arr[mario_position[0], mario_position[1]+1]))
+        #print("Mario's position: " + str(mario_position) + " In front of Mario: " + str(game_area[mario_position[0], mario_position[1]+1]))
 
-        goopher_position, goopher_count = self.find_position(current_environment, self.goopher_sprite)
+        goopher_position, goopher_count = self.find_position(game_area_bits, self.goopher_sprite)
 
-        #print("Current Mario y postion: " + str(mario_position[0]) + " What's below Mario: " + str(current_environment_arr[mario_position[0]+1, mario_position[1]]))
+        #print("Current Mario y postion: " + str(mario_position[0]) + " What's below Mario: " + str(game_area[mario_position[0]+1, mario_position[1]]))
 
-        floor_position, floor_count = self.find_position(current_environment, 0) # Right most position of a floor tile
+        floor_position, floor_count = self.find_position(game_area_bits, TILE_EMPTY) # Right most position of a floor tile
 
         #print("Floor position is: " + str(floor_position) + " Floor count: " + str(floor_count)) 
 
@@ -246,65 +296,65 @@ class MarioExpert:
         if self.environment.act_freq != 1:
             self.environment.set_freq(10)
 
-        coin_position, _ = self.find_position(current_environment, 5)
+        coin_position, _ = self.find_position(game_area_bits, TILE_COIN)
         
         if mario_position[1] < 16:
             # If anything in front of Mario - jump
-            if (current_environment_arr[mario_position[0], mario_position[1]+1] != 0 and goopher_count != 2 or
-                current_environment_arr[mario_position[0], mario_position[1]+1] == 5 and current_environment_arr[mario_position[0]-1, mario_position[1]+1] == 10 or
-                current_environment_arr[mario_position[0], mario_position[1]+1] == 0 and current_environment_arr[mario_position[0]-1, mario_position[1]+1] == 10 or
-                mario_position[0] == 13 and current_environment_arr[mario_position[0]+2, mario_position[1]+1] == 0 and 
-                current_environment_arr[mario_position[0]+2, mario_position[1]+4] == 0): 
+            if (not game_area_bits[mario_position[0], mario_position[1]+1] & self.empty_mask and goopher_count != 2 or
+                game_area_bits[mario_position[0], mario_position[1]+1] & self.coin_mask and game_area_bits[mario_position[0]-1, mario_position[1]+1] & self.block_mask or
+                game_area_bits[mario_position[0], mario_position[1]+1] & self.empty_mask and game_area_bits[mario_position[0]-1, mario_position[1]+1] & self.block_mask or
+                mario_position[0] == 13 and game_area_bits[mario_position[0]+2, mario_position[1]+1] & self.empty_mask and 
+                game_area_bits[mario_position[0]+2, mario_position[1]+4] & self.empty_mask): 
                 print('Jumping')
                 
                 print(coin_position)
                 
-                if (mario_position[0] == 13 and current_environment_arr[mario_position[0]+2, mario_position[1]+1] == 0 and 
-                current_environment_arr[mario_position[0]+2, mario_position[1]+4] == 0):
+                if (mario_position[0] == 13 and game_area_bits[mario_position[0]+2, mario_position[1]+1] & self.empty_mask and 
+                game_area_bits[mario_position[0]+2, mario_position[1]+4] & self.empty_mask):
                     self.environment.set_freq(10)
                 
-                if (current_environment_arr[mario_position[0], mario_position[1]+1] == 10 and current_environment_arr[mario_position[0]+1, mario_position[1]] == 10
-                    and current_environment_arr[mario_position[0]-1, mario_position[1]+1] == 0 and mario_position[0] == 12):
+                if (game_area_bits[mario_position[0], mario_position[1]+1] & self.block_mask and game_area_bits[mario_position[0]+1, mario_position[1]] & self.block_mask
+                    and game_area_bits[mario_position[0]-1, mario_position[1]+1] & self.empty_mask and mario_position[0] == 12):
                     self.environment.set_freq(1)
                     #while True:
                         #pass
                 '''
-                if current_environment_arr[mario_position[0], mario_position[1]+1] == 0 and current_environment_arr[mario_position[0]-1, mario_position[1]+1] == 10:
+                if game_area[mario_position[0], mario_position[1]+1] == 0 and game_area[mario_position[0]-1, mario_position[1]+1] == 10:
                     print('smelly balls')
                     #while True:
                         #pass
                 
-                if current_environment_arr[mario_position[0], mario_position[1]+1] == 5 and current_environment_arr[mario_position[0]-1, mario_position[1]+1] == 10:
+                if game_area[mario_position[0], mario_position[1]+1] == 5 and game_area[mario_position[0]-1, mario_position[1]+1] == 10:
                     while True:
                         pass
                 '''
                 return 4, None # jump
             
             # Special double goopher case
-            elif goopher_count == 2 and current_environment_arr[mario_position[0]+1, mario_position[1]] == 10:
+            elif goopher_count == 2 and game_area_bits[mario_position[0]+1, mario_position[1]] & self.block_mask:
                 print("Two gophers")
                 if goopher_position[1][1] - mario_position[1] <= dble_gpher_dist and goopher_position[1][1] - mario_position[1] >= dble_gpher_dist - gphr_pause and goopher_position[1][1] >= mario_position[1] and goopher_position[0][1] >= mario_position[1]:
                     print("Pausing")
                     return 0, None # Do nothing
-                elif current_environment_arr[mario_position[0], mario_position[1]+1] != 0:
+                elif not game_area_bits[mario_position[0], mario_position[1]+1] & self.empty_mask:
                     print('Jumping - in goopher')
                     return 4, None
             
             # Speical need to jump over floor case
-            elif (current_environment_arr[15, mario_position[1]+2] != 10 and mario_position[0] == 13 and floor_count == 2 or
+            elif (not game_area_bits[15, mario_position[1]+2] & self.block_mask and mario_position[0] == 13 and floor_count == 2 or
             mario_position == [10,9] and floor_position is not None and floor_count == 2 and abs(floor_position[1]-1 - mario_position[1]) <= 1 and
-            current_environment_arr[mario_position[0]+1, mario_position[1]] == 10):
+            game_area_bits[mario_position[0]+1, mario_position[1]] & self.block_mask):
                 
                 if (mario_position == [10,9] and floor_position is not None and floor_count == 2 and abs(floor_position[1]-1 - mario_position[1]) <= 1
-                    and current_environment_arr[mario_position[0]+1, mario_position[1]] == 10):
+                    and game_area_bits[mario_position[0]+1, mario_position[1]] & self.block_mask):
                     self.environment.set_freq(3)
                     return 4, None
                 
-                return (4, 30) if current_environment_arr[mario_position[0], mario_position[1]+5] == 10 else (4, None) 
+                return (4, 30) if game_area_bits[mario_position[0], mario_position[1]+5] & self.block_mask else (4, None) 
             
             # On any pipe small pipe - pause then jump
-            #elif mario_position[0] < 13 and mario_position[0] > 10 and current_environment_arr[mario_position[0]+1, mario_position[1]] == 14:
-            elif current_environment_arr[mario_position[0]+1, mario_position[1]] == 14 and goopher_position is not None:
+            #elif mario_position[0] < 13 and mario_position[0] > 10 and game_area[mario_position[0]+1, mario_position[1]] == 14:
+            elif game_area_bits[mario_position[0]+1, mario_position[1]] & self.pipe_mask and goopher_position is not None:
                 print('Entered pipe jump')
                 if goopher_position[0][1] >= mario_position[1]:
                     print('Entered 2')
@@ -316,7 +366,7 @@ class MarioExpert:
                         return 0, None
                     
             # Bouncy bug bitches in front of Mario
-            elif mario_position[1] < 19-4 and current_environment_arr[mario_position[0]-2, mario_position[1]+4] == 18:
+            elif mario_position[1] < 19-4 and game_area_bits[mario_position[0]-2, mario_position[1]+4] & self.fly_mask:
                 print('Avoiding bug bitches')
                 return 4, None
             
@@ -330,6 +380,27 @@ class MarioExpert:
         #return random.randint(0, len(self.environment.valid_actions) - 1)
         return 2, None
 
+    def check_action(self, action):
+        """
+        Plays the chosen action and the alternatives ahead on the rollout workers, and swaps the chosen action for the
+        best alternative if it loses a life.
+
+        The chosen action is kept if its rollout didn't finish before the deadline.
+        """
+        candidates = [action] + [a for a in self.rollout_actions if a != action]
+        plans = [[(a, self.environment.act_freq), (2, self.rollout_frames)] for a in candidates]
+
+        outcomes = self.environment.evaluate_plans(plans)
+        if np.isnan(outcomes[0, LIFE_LOST]) or outcomes[0, LIFE_LOST] == 0:
+            return action
+
+        best = best_plan(outcomes)
+        if best is None:
+            return action
+
+        print(f"Rollouts swapped action {action} for {candidates[best]}")
+        return candidates[best]
+
     def step(self):
         """
         Modify this function as required to implement the Mario Expert agent's logic.
@@ -340,6 +411,9 @@ class MarioExpert:
         # Choose an action - button press or other...
         action, freq = self.choose_action()
 
+        # Check it doesn't get Mario killed
+        action = self.check_action(action)
+
         # Run the action on the environment
         self.environment.run_action(action, freq)
 
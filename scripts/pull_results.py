@@ -1,94 +1,131 @@
+import argparse
+import logging
 import os
 import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import virtualenv
 from pydrive2.auth import GoogleAuth
 from pydrive2.drive import GoogleDrive
 
+from agent_host import requirements_compatible
+from checkpoint import has_final_results, submission_hash
+from results_store import write_round_manifest
+from submission_sync import DriveSource, LocalSource, sync
 
-def read_folder(drive, title, file_id):
-    folder = {}
+logging.basicConfig(level=logging.INFO)
 
-    folder["title"] = title
-    folder["files"] = {}
-    folder["folders"] = []
+# COMPSYS726 - Assignment 1 Folder
+PRIMARY_FOLDER_ID = "1xM3Dhtm3YCoLnMFTMxyZnhJVvHsYbFgn"
 
-    drive_list = drive.ListFile(
-        {"q": f"'{file_id}' in parents and trashed=false"}
-    ).GetList()
 
-    for f in drive_list:
-        if f["mimeType"] == "application/vnd.google-apps.folder":
-            folder["folders"].append(read_folder(drive, f["title"], f["id"]))
-        else:
-            folder["files"][f["title"]] = {
-                "id": f["id"],
-                "title": f["title"],
-                "title1": f["alternateLink"],
-            }
+def get_args():
+    parse_args = argparse.ArgumentParser()
 
-    return folder
+    # Read submissions from a local directory of UPI folders instead of Google Drive
+    parse_args.add_argument("--source_path", type=str, default=None)
 
+    parse_args.add_argument(
+        "--workspace_path",
+        type=str,
+        default=f"{os.path.expanduser('~')}/workspaces",
+    )
 
-def print_folders(directory, tab=0):
-    tabs = " " * tab
+    parse_args.add_argument("--workers", type=int, default=8)
 
-    for _, file in directory["files"].items():
-        message = f"{tabs}File: {file['title']}, id: {file['id']}"
-        print(f"{message}")
+    # The tournament round being run - compare_results ranks the submissions entered into it
+    parse_args.add_argument("--round", type=str, default="default")
 
-    for folder in directory["folders"]:
-        message = f"{tabs}Folder: {folder['title']}"
-        print(f"{message}")
-        print_folders(folder, tab=tab + 5)
+    # Submissions per in-process agent host - 0 gives every submission its own virtualenv
+    parse_args.add_argument("--agents_per_host", type=int, default=8)
 
+    return parse_args.parse_args()
 
-def run_venv(upi, requirement_path):
+
+def run_venv(upi, workspace, sub_hash):
     path = f"{os.path.expanduser('~')}/venv"
     venv_dir = os.path.join(path, f"{upi}")
     virtualenv.cli_run([venv_dir])
 
     python_bin = f"{path}/{upi}/bin/python3"
 
-    command = f". {venv_dir}/bin/activate && pip install -r {requirement_path}/requirements.txt"
-    os.system(command)
+    subprocess.run(
+        [python_bin, "-m", "pip", "install", "-r", f"{workspace}/requirements.txt"],
+        check=False,
+    )
 
-    return subprocess.Popen([python_bin, "run.py", "--upi", upi, "--headless"])
+    # run.py resumes from the last checkpoint in the results directory if the previous run died
+    return subprocess.Popen(
+        [python_bin, "run.py", "--upi", upi, "--headless", "--submission_hash", sub_hash],
+        cwd=f"{workspace}/scripts",
+    )
 
 
 def main():
-    gauth = GoogleAuth()
-    gauth.LocalWebserverAuth()
+    args = get_args()
 
-    drive = GoogleDrive(gauth)
+    if args.source_path is not None:
+        source = LocalSource(args.source_path)
+    else:
+        gauth = GoogleAuth()
+        gauth.LocalWebserverAuth()
 
-    # COMPSYS726 - Assignment 1 Folder
-    primary_folder_id = "1xM3Dhtm3YCoLnMFTMxyZnhJVvHsYbFgn"
+        drive = GoogleDrive(gauth)
 
-    directory = read_folder(drive, "COMPSYS726 - Assignments", primary_folder_id)
+        source = DriveSource(drive, PRIMARY_FOLDER_ID)
 
-    print_folders(directory)
+    workspaces = sync(source, args.workspace_path, workers=args.workers)
 
-    sub_processes = {}
-    for folders in directory["folders"]:
-        upi = folders["title"]
-        print(f"Title: {upi}")
+    results_path = f"{Path(__file__).parent.parent}/results"
 
-        files = folders["files"]
-        requirements_id = files["requirements.txt"]["id"]
-        mario_expert_id = files["mario_expert.py"]["id"]
+    hashes = {}
+    pending = {}
+    for upi, workspace in workspaces.items():
+        sub_hash = submission_hash(
+            [f"{workspace}/requirements.txt", f"{workspace}/scripts/mario_expert.py"]
+        )
+        hashes[upi] = sub_hash
 
-        requirement_path = f"{Path(__file__).parent.parent}"
+        # Only recompute submissions that failed or have changed since their last run
+        if has_final_results(f"{results_path}/{upi}", sub_hash):
+            print(f"Skipping {upi} - results are up to date")
+            continue
 
-        file = drive.CreateFile({"id": requirements_id})
-        file.GetContentFile(f"{requirement_path}/requirements.txt")
+        pending[upi] = (workspace, sub_hash)
 
-        file = drive.CreateFile({"id": mario_expert_id})
-        file.GetContentFile("mario_expert.py")
+    # Includes the skipped submissions - their existing results still count towards this round
+    write_round_manifest(results_path, args.round, hashes)
+
+    sub_processes = {}
 
-        p = run_venv(upi, requirement_path)
-        sub_processes[upi] = p
+    if args.agents_per_host > 0:
+        # Submissions that only need what is already installed share host processes instead of virtualenvs
+        hosted = [
+            upi
+            for upi, (workspace, _) in pending.items()
+            if requirements_compatible(f"{workspace}/requirements.txt")
+        ]
+
+        for i in range(0, len(hosted), args.agents_per_host):
+            upis = hosted[i : i + args.agents_per_host]
+            # The host runs from this directory, so relative workspace paths would point at the wrong place
+            workspaces_arg = [os.path.abspath(pending.pop(upi)[0]) for upi in upis]
+            p = subprocess.Popen(
+                [sys.executable, "agent_host.py", "--workspaces", *workspaces_arg],
+                cwd=f"{Path(__file__).parent}",
+            )
+            sub_processes[f"host: {', '.join(upis)}"] = p
+
+    # Each submission has its own workspace so installs and runs overlap
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = {
+            upi: pool.submit(run_venv, upi, workspace, sub_hash)
+            for upi, (workspace, sub_hash) in pending.items()
+        }
+        for upi, future in futures.items():
+            sub_processes[upi] = future.result()
 
     for upi, p in sub_processes.items():
         exit_code = p.wait()
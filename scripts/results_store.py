@@ -0,0 +1,275 @@
+"""
+Incremental SQLite store for the results.json files produced by run.py.
+
+Only results.json files that are new or have changed (by mtime/size, then content hash) since the last ingest are
+read. The best episode of every UPI in every round is kept in its own table as results are ingested, so the rankings
+are read straight off an index instead of re-sorting every result.
+
+Results are grouped by tournament round and each UPI can have several episodes in a round - any results.json found
+below "{results_path}/{upi}/" is treated as one episode for that UPI.
+
+results/{upi}/results.json is only rewritten when a submission is rerun, so pull_results records which submission each
+UPI entered into a round in "{results_path}/rounds/{round}.json". When that manifest exists only results produced by
+the entered submission (by submission_hash) count towards the round - an unchanged submission keeps its previous
+results, while a resubmission's old results are left out until it has been rerun.
+"""
+
+import glob
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    path TEXT NOT NULL,
+    round TEXT NOT NULL,
+    upi TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    submission_hash TEXT,
+    world INTEGER NOT NULL,
+    stage INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (round, path)
+);
+CREATE INDEX IF NOT EXISTS results_best ON results (round, upi, world DESC, stage DESC, score DESC);
+CREATE INDEX IF NOT EXISTS results_upi ON results (upi, round);
+
+CREATE TABLE IF NOT EXISTS best (
+    round TEXT NOT NULL,
+    upi TEXT NOT NULL,
+    path TEXT NOT NULL,
+    world INTEGER NOT NULL,
+    stage INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    PRIMARY KEY (round, upi)
+);
+CREATE INDEX IF NOT EXISTS best_rank ON best (round, world DESC, stage DESC, score DESC);
+"""
+
+ROUNDS_DIRECTORY = "rounds"
+
+
+def write_round_manifest(results_path: str, round_name: str, hashes: dict[str, str]) -> None:
+    """
+    Records the submission hash each UPI entered into round_name.
+    """
+    rounds_path = f"{results_path}/{ROUNDS_DIRECTORY}"
+    os.makedirs(rounds_path, exist_ok=True)
+
+    tmp_path = f"{rounds_path}/{round_name}.json.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(hashes, file)
+    os.replace(tmp_path, f"{rounds_path}/{round_name}.json")
+
+
+def read_round_manifest(results_path: str, round_name: str) -> dict[str, str]:
+    """
+    Returns {upi: submission hash} for round_name, or None if the round has no manifest.
+    """
+    try:
+        with open(f"{results_path}/{ROUNDS_DIRECTORY}/{round_name}.json", "r", encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+class ResultsStore:
+    """
+    Keeps an indexed copy of every results.json ingested so far.
+
+    Args:
+        db_path (str): The SQLite database file - created if it doesn't exist.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def ingest(self, results_path: str, round_name: str = "default") -> int:
+        """
+        Adds new or changed results.json files under results_path to round_name and drops ones that no longer exist
+        or, if the round has a manifest, weren't produced by the submission entered into the round.
+
+        Returns the number of results.json files that were (re)read.
+        """
+        manifest = read_round_manifest(results_path, round_name)
+
+        known = {
+            row["path"]: row
+            for row in self.connection.execute(
+                "SELECT path, upi, mtime_ns, size, sha256, submission_hash FROM results WHERE round = ?",
+                (round_name,),
+            )
+        }
+
+        seen = set()
+        changed_upis = set()
+        updated = 0
+        for result_file in glob.glob(f"{results_path}/*/**/results.json", recursive=True):
+            path = os.path.relpath(result_file, results_path)
+            upi = path.split(os.sep)[0]
+            expected_hash = manifest.get(upi) if manifest is not None else None
+            seen.add(path)
+
+            stat = os.stat(result_file)
+            row = known.get(path)
+            if (
+                row is not None
+                and (row["mtime_ns"], row["size"]) == (stat.st_mtime_ns, stat.st_size)
+                and (manifest is None or row["submission_hash"] == expected_hash)
+            ):
+                continue
+
+            with open(result_file, "rb") as file:
+                raw = file.read()
+            sha = hashlib.sha256(raw).hexdigest()
+
+            try:
+                result = json.loads(raw)
+                world, stage, score = result["world"], result["stage"], result["score"]
+            except (json.JSONDecodeError, KeyError) as error:
+                logging.warning(f"Skipping unreadable results file: {result_file} ({error!r})")
+                continue
+
+            sub_hash = result.get("submission_hash")
+            if manifest is not None and (expected_hash is None or sub_hash != expected_hash):
+                # Left over from an earlier submission that hasn't been rerun yet - dropped below if it was stored
+                logging.info(f"Skipping {path} - not produced by the submission entered into {round_name}")
+                seen.discard(path)
+                continue
+
+            if row is not None and row["sha256"] == sha:
+                # Touched but not changed - just remember the new mtime
+                self.connection.execute(
+                    "UPDATE results SET mtime_ns = ?, size = ? WHERE round = ? AND path = ?",
+                    (stat.st_mtime_ns, stat.st_size, round_name, path),
+                )
+                continue
+
+            logging.info(f"Reading results for UPI: {upi} ({path})")
+
+            self.connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    path,
+                    round_name,
+                    upi,
+                    stat.st_mtime_ns,
+                    stat.st_size,
+                    sha,
+                    sub_hash,
+                    world,
+                    stage,
+                    score,
+                    json.dumps(result),
+                ),
+            )
+            changed_upis.add(upi)
+            updated += 1
+
+        removed = [path for path in known if path not in seen]
+        self.connection.executemany(
+            "DELETE FROM results WHERE round = ? AND path = ?",
+            [(round_name, path) for path in removed],
+        )
+        changed_upis.update(known[path]["upi"] for path in removed)
+
+        self._update_best(round_name, changed_upis)
+
+        self.connection.commit()
+        return updated
+
+    def _update_best(self, round_name: str, upis: set[str]) -> None:
+        # Each lookup is a single seek on results_best rather than a sort of the UPI's episodes
+        for upi in upis:
+            row = self.connection.execute(
+                """
+                SELECT path, world, stage, score FROM results
+                WHERE round = ? AND upi = ?
+                ORDER BY world DESC, stage DESC, score DESC
+                LIMIT 1
+                """,
+                (round_name, upi),
+            ).fetchone()
+
+            if row is None:
+                self.connection.execute(
+                    "DELETE FROM best WHERE round = ? AND upi = ?", (round_name, upi)
+                )
+            else:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO best VALUES (?, ?, ?, ?, ?, ?)",
+                    (round_name, upi, row["path"], row["world"], row["stage"], row["score"]),
+                )
+
+    def ranking(self, round_name: str = None) -> list[dict]:
+        """
+        Ranks every UPI by its best episode (world, then stage, then score) - in round_name or across all rounds.
+        """
+        if round_name is not None:
+            rows = self.connection.execute(
+                """
+                SELECT upi, round, path, world, stage, score FROM best
+                WHERE round = ?
+                ORDER BY world DESC, stage DESC, score DESC
+                """,
+                (round_name,),
+            )
+            return [dict(row) for row in rows]
+
+        # Across rounds only the per round bests - one row per UPI per round - need to be compared
+        rows = self.connection.execute(
+            """
+            SELECT upi, round, path, world, stage, score FROM (
+                SELECT *, ROW_NUMBER() OVER (
+                    PARTITION BY upi ORDER BY world DESC, stage DESC, score DESC
+                ) AS rank
+                FROM best
+            )
+            WHERE rank = 1
+            ORDER BY world DESC, stage DESC, score DESC
+            """
+        )
+        return [dict(row) for row in rows]
+
+    def aggregates(self, round_name: str = None) -> list[dict]:
+        """
+        Summarises every UPI over all of its episodes - in round_name or across all rounds.
+
+        An episode carried into several rounds (the same results.json content) is only counted once.
+        """
+        where, params = ("WHERE round = ?", (round_name,)) if round_name is not None else ("", ())
+        rows = self.connection.execute(
+            f"""
+            SELECT
+                upi,
+                COUNT(*) AS episodes,
+                rounds,
+                MAX(world) AS best_world,
+                AVG(score) AS mean_score,
+                MIN(score) AS min_score,
+                MAX(score) AS max_score
+            FROM (
+                SELECT upi, sha256, MAX(world) AS world, MAX(score) AS score FROM results {where}
+                GROUP BY upi, sha256
+            )
+            JOIN (
+                SELECT upi, COUNT(DISTINCT round) AS rounds FROM results {where}
+                GROUP BY upi
+            ) USING (upi)
+            GROUP BY upi
+            ORDER BY best_world DESC, mean_score DESC
+            """,
+            params + params,
+        )
+        return [dict(row) for row in rows]
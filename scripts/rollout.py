@@ -0,0 +1,245 @@
+"""
+Parallel rollouts of candidate action plans on worker emulators.
+
+The controller serialises its current emulator state and a pool of worker processes - each holding its own preloaded,
+headless PyBoy - load it and play disjoint subsets of the candidate plans without rendering. Each plan is reduced to a
+compact outcome vector:
+
+    [x progress, life lost (0 or 1), score delta]
+
+The workers are started, and their emulators loaded, before the first decision. For each decision the state is sent
+to every worker once and the plans are handed out one at a time from a shared queue, so faster workers take more of
+them. Every decision has a deadline: workers skip plans once it has passed and results that come back after it -
+including ones belonging to an earlier decision - are discarded. Adding workers adds plans evaluated per decision
+rather than time per decision.
+
+A plan is a list of (action, frames) pairs, where action indexes the controller's valid_actions / release_button lists
+in the same way as MarioController.run_action.
+"""
+
+import io
+import multiprocessing
+import queue
+import time
+
+import numpy as np
+
+X_PROGRESS = 0
+LIFE_LOST = 1
+SCORE_DELTA = 2
+OUTCOME_SIZE = 3
+
+# Sent by each worker once its emulator is loaded
+READY = "ready"
+
+# Seconds a worker waits for a plan before dropping the states it has been sent but not used
+IDLE_TIMEOUT = 1.0
+
+# Per worker process state - set up once by _init_worker
+_environment = None
+_press = None
+_release = None
+
+
+def _init_worker(press: list, release: list) -> None:
+    global _environment, _press, _release  # pylint: disable=global-statement
+
+    # Imported here so only the workers need the emulator
+    from mario_environment import MarioEnvironment  # pylint: disable=import-outside-toplevel
+
+    _environment = MarioEnvironment(headless=True)
+    _press = press
+    _release = release
+
+
+def _rollout(state: bytes, plan: list[tuple[int, int]]) -> np.ndarray:
+    pyboy = _environment.pyboy
+    pyboy.load_state(io.BytesIO(state))
+
+    x_position = _environment.get_x_position()
+    lives = _environment.get_lives()
+    score = _environment.get_score()
+
+    for action, frames in plan:
+        pyboy.send_input(_press[action])
+        pyboy.tick(frames, render=False)
+        pyboy.send_input(_release[action])
+
+        if _environment.get_game_over():
+            break
+
+    # The lives counter only drops once the death animation has finished, so a short plan that kills Mario shows up
+    # in the death timers instead
+    life_lost = (
+        _environment.get_lives() < lives
+        or _environment.get_game_over()
+        or _environment.get_dead_timer() != 0
+        or _environment.get_dead_jump_timer() != 0
+    )
+
+    return np.array(
+        [
+            _environment.get_x_position() - x_position,
+            float(life_lost),
+            _environment.get_score() - score,
+        ],
+        dtype=np.float32,
+    )
+
+
+def _worker(press, release, states, tasks, results) -> None:
+    _init_worker(press, release)
+    results.put(READY)
+
+    decision, state = 0, None
+    while True:
+        try:
+            task = tasks.get(timeout=IDLE_TIMEOUT)
+        except queue.Empty:
+            # Let go of the states for decisions the other workers played so they don't pile up in the queue
+            try:
+                while True:
+                    decision, state = states.get_nowait()
+            except queue.Empty:
+                pass
+            continue
+
+        task_decision, index, plan, deadline = task
+
+        # The state for a decision is always queued before its plans
+        while decision < task_decision:
+            decision, state = states.get()
+
+        # Don't hold the worker up with work that will be thrown away
+        if decision != task_decision or time.time() > deadline:
+            continue
+
+        results.put((decision, index, _rollout(state, plan)))
+
+
+class RolloutPool:
+    """
+    A pool of worker emulators for evaluating candidate plans in parallel.
+
+    Args:
+        valid_actions (list[WindowEvent]): The button presses plans index into.
+        release_button (list[WindowEvent]): The matching button releases.
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        deadline (float): Seconds each call to evaluate may take. Defaults to 0.05.
+        start_timeout (float): Seconds to wait for the workers to load their emulators. Defaults to 60.
+        context (str): The multiprocessing start method. Defaults to "spawn" so the workers don't inherit the
+            parent's SDL window.
+    """
+
+    def __init__(
+        self,
+        valid_actions: list,
+        release_button: list,
+        workers: int = None,
+        deadline: float = 0.05,
+        start_timeout: float = 60.0,
+        context: str = "spawn",
+    ) -> None:
+        self.workers = workers if workers is not None else multiprocessing.cpu_count()
+        self.deadline = deadline
+        self.decision = 0
+
+        context = multiprocessing.get_context(context)
+        self.tasks = context.Queue()
+        self.results = context.Queue()
+        self.states = [context.Queue() for _ in range(self.workers)]
+        self.processes = [
+            context.Process(
+                target=_worker,
+                args=(list(valid_actions), list(release_button), states, self.tasks, self.results),
+                daemon=True,
+            )
+            for states in self.states
+        ]
+        for process in self.processes:
+            process.start()
+
+        # Wait for every emulator so the first decisions aren't spent loading the ROM
+        end_time = time.time() + start_timeout
+        for _ in self.processes:
+            try:
+                self.results.get(timeout=max(end_time - time.time(), 0))
+            except queue.Empty:
+                self.close()
+                raise RuntimeError(f"Rollout workers did not start within {start_timeout} seconds") from None
+
+    def evaluate(self, state: bytes, plans: list, deadline: float = None) -> np.ndarray:
+        """
+        Plays every plan from state and returns a (len(plans), OUTCOME_SIZE) array of outcomes.
+
+        Rows for plans that weren't finished before the deadline are NaN.
+        """
+        deadline = deadline if deadline is not None else self.deadline
+        end_time = time.time() + deadline
+
+        outcomes = np.full((len(plans), OUTCOME_SIZE), np.nan, dtype=np.float32)
+
+        if not plans:
+            return outcomes
+
+        self.decision += 1
+
+        # The state only crosses to each worker once, however many plans it plays
+        for states in self.states:
+            states.put((self.decision, state))
+
+        for i, plan in enumerate(plans):
+            self.tasks.put((self.decision, i, plan, end_time))
+
+        received = 0
+        while received < len(plans):
+            remaining = end_time - time.time()
+            if remaining <= 0:
+                break
+
+            try:
+                decision, index, outcome = self.results.get(timeout=remaining)
+            except queue.Empty:
+                break
+
+            # Finished too late for an earlier decision
+            if decision != self.decision:
+                continue
+
+            outcomes[index] = outcome
+            received += 1
+
+        return outcomes
+
+    def close(self) -> None:
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def best_plan(outcomes: np.ndarray) -> int:
+    """
+    Returns the index of the best evaluated plan - no life lost first, then most x progress, then most score.
+
+    Returns None if no plan was evaluated in time.
+    """
+    evaluated = np.flatnonzero(~np.isnan(outcomes[:, X_PROGRESS]))
+    if len(evaluated) == 0:
+        return None
+
+    # np.lexsort sorts by the last key first
+    order = np.lexsort(
+        (
+            -outcomes[evaluated, SCORE_DELTA],
+            -outcomes[evaluated, X_PROGRESS],
+            outcomes[evaluated, LIFE_LOST],
+        )
+    )
+    return int(evaluated[order[0]])
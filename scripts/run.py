@@ -9,6 +9,7 @@ import logging
 import os
 from pathlib import Path
 
+import checkpoint
 from mario_expert import MarioExpert
 
 logging.basicConfig(level=logging.INFO)
@@ -21,10 +22,15 @@ def get_args():
 
     parse_args.add_argument("--upi", type=str, required=True)
 
+    # Steps between checkpoints - 0 disables checkpointing and resuming
+    parse_args.add_argument("--checkpoint_interval", type=int, default=1000)
+
+    parse_args.add_argument("--submission_hash", type=str, default=None)
+
     return parse_args.parse_args()
 
 
-def run(upi, headless):
+def run(upi, headless, checkpoint_interval=0, submission_hash=None):
     if upi == "your_upi":
         raise ValueError("Please set your UPI in the run.py file")
 
@@ -34,14 +40,33 @@ def run(upi, headless):
     if not os.path.exists(results_path):
         os.makedirs(results_path)
 
+    if submission_hash is not None and checkpoint.has_final_results(
+        results_path, submission_hash
+    ):
+        logging.info(f"Results for {upi} are up to date - skipping")
+        return
+
     expert = MarioExpert(results_path=results_path, headless=headless)
-    expert.play()
+
+    if checkpoint_interval > 0:
+        if submission_hash is None:
+            # Tie local checkpoints to the code that wrote them so editing mario_expert.py starts a fresh run
+            submission_hash = checkpoint.submission_hash(
+                [
+                    f"{Path(__file__).parent.parent}/requirements.txt",
+                    f"{Path(__file__).parent}/mario_expert.py",
+                ]
+            )
+
+        checkpoint.play(expert, results_path, checkpoint_interval, submission_hash)
+    else:
+        expert.play()
 
 
 def main():
     args = get_args()
 
-    run(args.upi, args.headless)
+    run(args.upi, args.headless, args.checkpoint_interval, args.submission_hash)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,272 @@
+"""
+Sync stage for the automated competition.
+
+Submissions are listed and fetched from a SubmissionSource with a bounded thread pool, and each one is placed into its
+own isolated workspace so several submissions can be installed and run at the same time:
+
+    {workspace_root}/{upi}/requirements.txt
+    {workspace_root}/{upi}/scripts/         <- the evaluation scripts plus the submitted mario_expert.py
+    {workspace_root}/{upi}/roms -> roms     (symlink)
+    {workspace_root}/{upi}/results -> results (symlink)
+
+Files whose checksum matches the last sync are not downloaded again.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+from abc import ABCMeta, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+SUBMISSION_FILES = ("requirements.txt", "mario_expert.py")
+
+# Where each submission file lives inside a workspace
+WORKSPACE_PATHS = {
+    "requirements.txt": "requirements.txt",
+    "mario_expert.py": "scripts/mario_expert.py",
+}
+
+# The evaluation scripts copied into every workspace - the submission only provides mario_expert.py
+EVALUATION_SCRIPTS = (
+    "run.py",
+    "checkpoint.py",
+    "mario_environment.py",
+    "pyboy_environment.py",
+    "rollout.py",
+)
+
+MANIFEST_FILE = ".sync.json"
+
+
+def md5_checksum(path: str) -> str:
+    md5 = hashlib.md5()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 16), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+class SubmissionSource(metaclass=ABCMeta):
+    """
+    This is a base class for where submissions are fetched from.
+
+    A file entry is a dict with at least "title" and "checksum" keys plus whatever the source needs to fetch it.
+    """
+
+    @abstractmethod
+    def list_submissions(self, workers: int) -> dict[str, dict[str, dict]]:
+        """
+        Returns {upi: {file title: file entry}} for every submission.
+        """
+
+    @abstractmethod
+    def fetch(self, entry: dict, destination: str) -> None:
+        """
+        Downloads the file described by entry to destination.
+        """
+
+
+class DriveSource(SubmissionSource):
+    """
+    Submissions stored on Google Drive as one folder per UPI inside the assignment folder.
+
+    Args:
+        drive (GoogleDrive): An authenticated pydrive2 GoogleDrive.
+        folder_id (str): The id of the assignment folder.
+    """
+
+    def __init__(self, drive, folder_id: str):
+        self.drive = drive
+        self.folder_id = folder_id
+
+    def _list_folder(self, file_id: str) -> list[dict]:
+        return self.drive.ListFile(
+            {"q": f"'{file_id}' in parents and trashed=false"}
+        ).GetList()
+
+    def _list_files(self, folder_id: str) -> dict[str, dict]:
+        files = {}
+        for f in self._list_folder(folder_id):
+            if f["mimeType"] == "application/vnd.google-apps.folder":
+                continue
+
+            files[f["title"]] = {
+                "id": f["id"],
+                "title": f["title"],
+                "checksum": f.get("md5Checksum"),
+            }
+        return files
+
+    def list_submissions(self, workers: int) -> dict[str, dict[str, dict]]:
+        folders = [
+            f
+            for f in self._list_folder(self.folder_id)
+            if f["mimeType"] == "application/vnd.google-apps.folder"
+        ]
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            listings = pool.map(lambda f: self._list_files(f["id"]), folders)
+
+            return {f["title"]: files for f, files in zip(folders, listings)}
+
+    def fetch(self, entry: dict, destination: str) -> None:
+        file = self.drive.CreateFile({"id": entry["id"]})
+        file.GetContentFile(destination)
+
+
+class LocalSource(SubmissionSource):
+    """
+    Submissions stored in a local directory as one sub-directory per UPI - a stand-in for Drive when testing.
+
+    Args:
+        root (str): The directory holding the UPI directories.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _list_files(self, folder: str) -> dict[str, dict]:
+        files = {}
+        for entry in os.scandir(folder):
+            if not entry.is_file():
+                continue
+
+            files[entry.name] = {
+                "path": entry.path,
+                "title": entry.name,
+                "checksum": md5_checksum(entry.path),
+            }
+        return files
+
+    def list_submissions(self, workers: int) -> dict[str, dict[str, dict]]:
+        folders = sorted(
+            (entry for entry in os.scandir(self.root) if entry.is_dir()),
+            key=lambda entry: entry.name,
+        )
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            listings = pool.map(lambda f: self._list_files(f.path), folders)
+
+            return {f.name: files for f, files in zip(folders, listings)}
+
+    def fetch(self, entry: dict, destination: str) -> None:
+        shutil.copyfile(entry["path"], destination)
+
+
+def _link(target: str, link: str) -> None:
+    if os.path.islink(link) or os.path.exists(link):
+        return
+    os.symlink(target, link)
+
+
+def prepare_workspace(workspace: str, package_path: str) -> None:
+    """
+    Creates the workspace layout and copies in the evaluation scripts so each submission runs in isolation.
+    """
+    scripts_path = f"{workspace}/scripts"
+    os.makedirs(scripts_path, exist_ok=True)
+
+    for script in EVALUATION_SCRIPTS:
+        shutil.copyfile(f"{package_path}/scripts/{script}", f"{scripts_path}/{script}")
+
+    os.makedirs(f"{package_path}/results", exist_ok=True)
+    _link(f"{package_path}/roms", f"{workspace}/roms")
+    _link(f"{package_path}/results", f"{workspace}/results")
+
+
+def _read_manifest(workspace: str) -> dict[str, str]:
+    try:
+        with open(f"{workspace}/{MANIFEST_FILE}", "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def _write_manifest(workspace: str, manifest: dict[str, str]) -> None:
+    tmp_path = f"{workspace}/{MANIFEST_FILE}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file)
+    os.replace(tmp_path, f"{workspace}/{MANIFEST_FILE}")
+
+
+def _sync_file(source, workspace, manifest, entry) -> bool:
+    title = entry["title"]
+    destination = f"{workspace}/{WORKSPACE_PATHS[title]}"
+
+    if (
+        entry["checksum"] is not None
+        and manifest.get(title) == entry["checksum"]
+        and os.path.exists(destination)
+    ):
+        return False
+
+    source.fetch(entry, destination)
+    # Record what is on disk so sources without checksums are still compared on the next sync
+    manifest[title] = (
+        entry["checksum"] if entry["checksum"] is not None else md5_checksum(destination)
+    )
+    return True
+
+
+def sync(
+    source: SubmissionSource,
+    workspace_root: str,
+    workers: int = 8,
+    package_path: str = None,
+) -> dict[str, str]:
+    """
+    Brings every workspace in workspace_root up to date with source.
+
+    package_path is the checkout the evaluation scripts, roms and results are taken from - defaults to this one.
+
+    Returns {upi: workspace path} for every complete submission.
+    """
+    if package_path is None:
+        package_path = f"{Path(__file__).parent.parent}"
+
+    # Workspaces are run from their own scripts directory, so hand back paths that don't depend on the cwd
+    workspace_root = os.path.abspath(workspace_root)
+
+    submissions = source.list_submissions(workers)
+    logging.info(f"Found {len(submissions)} submissions")
+
+    workspaces = {}
+    manifests = {}
+    jobs = []
+    for upi, files in submissions.items():
+        missing = [title for title in SUBMISSION_FILES if title not in files]
+        if missing:
+            logging.warning(f"Skipping {upi} - missing {missing}")
+            continue
+
+        workspace = f"{workspace_root}/{upi}"
+        prepare_workspace(workspace, package_path)
+
+        workspaces[upi] = workspace
+        manifests[upi] = _read_manifest(workspace)
+        for title in SUBMISSION_FILES:
+            jobs.append((upi, files[title]))
+
+    failed = set()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            (upi, entry, pool.submit(_sync_file, source, workspaces[upi], manifests[upi], entry))
+            for upi, entry in jobs
+        ]
+
+        for upi, entry, future in futures:
+            try:
+                if future.result():
+                    logging.info(f"Fetched {entry['title']} for {upi}")
+            except Exception as error:  # pylint: disable=broad-except
+                logging.error(f"Failed to fetch {entry['title']} for {upi}: {error}")
+                failed.add(upi)
+
+    for upi, workspace in workspaces.items():
+        # Files that did sync are still recorded so only the failed ones are fetched next time
+        _write_manifest(workspace, manifests[upi])
+
+    return {upi: workspace for upi, workspace in workspaces.items() if upi not in failed}
@@ -0,0 +1,95 @@
+"""
+Stand-ins for MarioExpert and its environment so the evaluation tooling can be tested without PyBoy or a ROM.
+
+The emulator state is just the frame counter, and the game is over once `length` frames have been played.
+"""
+
+
+class FakeFrame:
+    shape = (2, 3, 3)
+
+
+class FakeVideo:
+    def __init__(self):
+        self.frames = 0
+        self.released = False
+
+    def write(self, frame):
+        self.frames += 1
+
+    def release(self):
+        self.released = True
+
+
+class FakePyBoy:
+    def __init__(self):
+        self.frame = 0
+        self.stopped = False
+
+    def save_state(self, file):
+        file.write(str(self.frame).encode("utf-8"))
+
+    def load_state(self, file):
+        self.frame = int(file.read())
+
+    def stop(self, save=True):
+        self.stopped = True
+
+
+class FakeEnvironment:
+    def __init__(self, length):
+        self.pyboy = FakePyBoy()
+        self.screen = None
+        self.length = length
+
+    def reset(self):
+        self.pyboy.frame = 0
+
+    def grab_frame(self):
+        return FakeFrame()
+
+    def get_game_over(self):
+        return self.pyboy.frame >= self.length
+
+    def game_state(self):
+        return {"world": 1, "stage": 1, "score": self.pyboy.frame}
+
+    def invalidate_game_area(self):
+        pass
+
+
+class FakeExpert:
+    """
+    mode is "finish" to play normally, "raise" to fail on the first step or "hang" to never return from a step.
+    """
+
+    length = 10
+    mode = "finish"
+
+    def __init__(self, results_path, headless=False):
+        self.results_path = results_path
+        self.environment = FakeEnvironment(self.length)
+        self.video = None
+        self.decisions = 0
+
+    def step(self):
+        if self.mode == "raise":
+            raise RuntimeError("broken agent")
+
+        if self.mode == "hang":
+            # A submission's own error handling must not be able to swallow the host's timeout
+            while True:
+                try:
+                    while True:
+                        pass
+                except Exception:  # pylint: disable=broad-except
+                    pass
+
+        self.decisions += 1
+        self.environment.pyboy.frame += 1
+
+    def start_video(self, video_name, width, height):
+        self.video = FakeVideo()
+
+    def stop_video(self):
+        self.video.release()
@@ -0,0 +1,105 @@
+import importlib.metadata
+import os
+
+import pytest
+
+from agent_host import host, requirements_compatible
+
+# Written as each workspace's mario_expert.py - fake_mario is importable because pytest puts tests/ on sys.path
+EXPERT_TEMPLATE = """
+from fake_mario import FakeExpert
+
+
+class MarioExpert(FakeExpert):
+    mode = "{mode}"
+    length = {length}
+"""
+
+BROKEN_STOP_EXPERT = """
+from fake_mario import FakeExpert
+
+
+class MarioExpert(FakeExpert):
+    def __init__(self, results_path, headless=False):
+        super().__init__(results_path, headless)
+
+        def stop(save=True):
+            raise RuntimeError("emulator would not stop")
+
+        self.environment.pyboy.stop = stop
+"""
+
+
+def write_requirements(tmp_path, text):
+    path = tmp_path / "requirements.txt"
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_installed_requirements_are_compatible(tmp_path):
+    version = importlib.metadata.version("pytest")
+    path = write_requirements(tmp_path, f"# comment\n\npytest\npytest=={version}\n")
+
+    assert requirements_compatible(path)
+
+
+def test_wrong_pin_is_incompatible(tmp_path):
+    path = write_requirements(tmp_path, "pytest==0.0.1\n")
+
+    assert not requirements_compatible(path)
+
+
+def test_missing_package_is_incompatible(tmp_path):
+    path = write_requirements(tmp_path, "not-a-real-package-for-mario\n")
+
+    assert not requirements_compatible(path)
+
+
+@pytest.mark.parametrize("requirement", ["pytest>=1", "pytest[extra]", "-e .", "pytest; python_version>'3'"])
+def test_unsupported_specifiers_are_incompatible(tmp_path, requirement):
+    path = write_requirements(tmp_path, f"{requirement}\n")
+
+    assert not requirements_compatible(path)
+
+
+def make_workspace(tmp_path, upi, source):
+    workspace = tmp_path / upi
+    (workspace / "scripts").mkdir(parents=True)
+    (workspace / "requirements.txt").write_text("", encoding="utf-8")
+    (workspace / "scripts" / "mario_expert.py").write_text(source, encoding="utf-8")
+    return str(workspace)
+
+
+def test_agents_fail_independently(tmp_path):
+    workspaces = [
+        make_workspace(tmp_path, f"upi_{mode}", EXPERT_TEMPLATE.format(mode=mode, length=10))
+        for mode in ("raise", "hang", "finish")
+    ]
+
+    status = host(workspaces, checkpoint_interval=0, step_timeout=0.5)
+
+    assert status == {"upi_raise": "failed", "upi_hang": "failed", "upi_finish": "finished"}
+    assert os.path.exists(f"{workspaces[2]}/results/upi_finish/results.json")
+    assert not os.path.exists(f"{workspaces[0]}/results/upi_raise/results.json")
+
+
+def test_episode_timeout_only_stops_the_long_episode(tmp_path):
+    workspaces = [
+        make_workspace(tmp_path, "upi_long", EXPERT_TEMPLATE.format(mode="finish", length=10**9)),
+        make_workspace(tmp_path, "upi_short", EXPERT_TEMPLATE.format(mode="finish", length=10)),
+    ]
+
+    status = host(workspaces, checkpoint_interval=0, step_timeout=0, episode_timeout=0.2)
+
+    assert status == {"upi_long": "failed", "upi_short": "finished"}
+
+
+def test_failed_close_only_fails_that_agent(tmp_path):
+    workspaces = [
+        make_workspace(tmp_path, "upi_stop", BROKEN_STOP_EXPERT),
+        make_workspace(tmp_path, "upi_ok", EXPERT_TEMPLATE.format(mode="finish", length=10)),
+    ]
+
+    status = host(workspaces, checkpoint_interval=0)
+
+    assert status == {"upi_stop": "failed", "upi_ok": "finished"}
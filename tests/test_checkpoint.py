@@ -0,0 +1,109 @@
+import json
+import os
+
+import pytest
+
+import checkpoint
+from checkpoint import Checkpointer, episode, has_final_results
+from fake_mario import FakeExpert
+
+
+def write_results(results_path, **result):
+    os.makedirs(results_path, exist_ok=True)
+    with open(f"{results_path}/results.json", "w", encoding="utf-8") as file:
+        json.dump(result, file)
+
+
+def test_has_final_results_matches_only_the_same_hash(tmp_path):
+    results_path = str(tmp_path / "abc123")
+    assert not has_final_results(results_path, "hash")
+
+    write_results(results_path, world=1, stage=1, score=0, submission_hash="hash")
+    assert has_final_results(results_path, "hash")
+    assert not has_final_results(results_path, "other")
+
+    write_results(results_path, world=1, stage=1, score=0)
+    assert not has_final_results(results_path, "hash")
+
+
+def test_checkpoint_from_another_submission_is_ignored(tmp_path):
+    results_path = str(tmp_path / "abc123")
+    expert = FakeExpert(results_path)
+
+    Checkpointer(results_path, "old").save(expert, 4, 1)
+
+    assert Checkpointer(results_path, "new").load() is None
+    assert Checkpointer(results_path, None).load() is None
+    assert Checkpointer(results_path, "old").load()["steps"] == 4
+
+
+def test_failed_write_keeps_the_last_good_checkpoint(tmp_path, monkeypatch):
+    results_path = str(tmp_path / "abc123")
+    checkpointer = Checkpointer(results_path, "hash")
+
+    expert = FakeExpert(results_path)
+    expert.environment.pyboy.frame = 4
+    expert.decisions = 4
+    checkpointer.save(expert, 4, 1)
+
+    replace = os.replace
+
+    def failing_replace(src, dst):
+        if dst.endswith(checkpoint.CHECKPOINT_FILE):
+            raise OSError("disk full")
+        replace(src, dst)
+
+    expert.environment.pyboy.frame = 8
+    expert.decisions = 8
+    monkeypatch.setattr(checkpoint.os, "replace", failing_replace)
+    with pytest.raises(OSError):
+        checkpointer.save(expert, 8, 2)
+    monkeypatch.undo()
+
+    metadata = checkpointer.load()
+    assert metadata["steps"] == 4
+    assert metadata["segment"] == 1
+
+    resumed = FakeExpert(results_path)
+    checkpointer.restore(resumed, metadata)
+    assert resumed.environment.pyboy.frame == 4
+    assert resumed.decisions == 4
+
+
+def test_resume_continues_from_the_saved_step_and_segment(tmp_path):
+    results_path = str(tmp_path / "abc123")
+
+    # Killed after 7 steps - the last checkpoint was at step 6
+    killed = FakeExpert(results_path)
+    run = episode(killed, results_path, 3, "hash")
+    for _ in range(7):
+        next(run)
+
+    resumed = FakeExpert(results_path)
+    videos = []
+    start_video = resumed.start_video
+    resumed.start_video = lambda name, *size: videos.append(name) or start_video(name, *size)
+
+    steps = list(episode(resumed, results_path, 3, "hash"))
+
+    assert steps == [7, 8, 9, 10]
+    assert resumed.decisions == 10
+    assert [os.path.basename(name) for name in videos] == ["segment_0002.mp4", "segment_0003.mp4"]
+
+    with open(f"{results_path}/results.json", "r", encoding="utf-8") as file:
+        result = json.load(file)
+    assert result["score"] == 10
+    assert result["submission_hash"] == "hash"
+    assert not os.path.exists(f"{results_path}/{checkpoint.CHECKPOINT_DIRECTORY}")
+
+
+def test_resume_ignores_checkpoint_from_edited_submission(tmp_path):
+    results_path = str(tmp_path / "abc123")
+
+    run = episode(FakeExpert(results_path), results_path, 3, "old")
+    for _ in range(5):
+        next(run)
+
+    steps = list(episode(FakeExpert(results_path), results_path, 3, "new"))
+
+    assert steps[0] == 1
@@ -0,0 +1,131 @@
+import json
+import os
+
+import pytest
+
+from results_store import ResultsStore, write_round_manifest
+
+
+def write_result(results_path, upi, world=1, stage=1, score=0, submission_hash=None):
+    os.makedirs(results_path / upi, exist_ok=True)
+    result = {"world": world, "stage": stage, "score": score}
+    if submission_hash is not None:
+        result["submission_hash"] = submission_hash
+    with open(results_path / upi / "results.json", "w", encoding="utf-8") as file:
+        json.dump(result, file)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultsStore(str(tmp_path / "results.db"))
+    yield store
+    store.close()
+
+
+def test_ingest_only_reads_new_or_changed_files(tmp_path, store):
+    results_path = tmp_path / "results"
+    write_result(results_path, "abc123", score=100)
+    write_result(results_path, "xyz456", score=200)
+
+    assert store.ingest(str(results_path)) == 2
+    assert store.ingest(str(results_path)) == 0
+
+    write_result(results_path, "abc123", score=300)
+    assert store.ingest(str(results_path)) == 1
+
+    ranking = store.ranking("default")
+    assert [(r["upi"], r["score"]) for r in ranking] == [("abc123", 300), ("xyz456", 200)]
+
+
+def test_ingest_touched_but_unchanged_file_is_not_reread(tmp_path, store):
+    results_path = tmp_path / "results"
+    write_result(results_path, "abc123", score=100)
+    store.ingest(str(results_path))
+
+    result_file = results_path / "abc123" / "results.json"
+    stat = os.stat(result_file)
+    os.utime(result_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert store.ingest(str(results_path)) == 0
+
+
+def test_ranking_orders_by_world_then_stage_then_score(tmp_path, store):
+    results_path = tmp_path / "results"
+    write_result(results_path, "a", world=1, stage=2, score=100)
+    write_result(results_path, "b", world=1, stage=1, score=900)
+    write_result(results_path, "c", world=2, stage=1, score=0)
+    store.ingest(str(results_path))
+
+    assert [r["upi"] for r in store.ranking()] == ["c", "a", "b"]
+
+
+def test_unchanged_submission_is_still_ranked_in_a_new_round(tmp_path, store):
+    results_path = tmp_path / "results"
+    write_result(results_path, "a", score=100, submission_hash="a1")
+    write_result(results_path, "b", score=200, submission_hash="b1")
+    write_round_manifest(str(results_path), "r1", {"a": "a1", "b": "b1"})
+    store.ingest(str(results_path), "r1")
+
+    # Only b resubmitted and was rerun
+    write_result(results_path, "b", score=500, submission_hash="b2")
+    write_round_manifest(str(results_path), "r2", {"a": "a1", "b": "b2"})
+    store.ingest(str(results_path), "r2")
+
+    assert [(r["upi"], r["score"]) for r in store.ranking("r2")] == [("b", 500), ("a", 100)]
+    assert [(r["upi"], r["score"]) for r in store.ranking("r1")] == [("b", 200), ("a", 100)]
+
+    # a's carried over run is one episode over two rounds
+    aggregates = {r["upi"]: r for r in store.aggregates()}
+    assert (aggregates["a"]["episodes"], aggregates["a"]["rounds"]) == (1, 2)
+    assert (aggregates["b"]["episodes"], aggregates["b"]["rounds"]) == (2, 2)
+
+
+def test_results_of_a_replaced_submission_are_left_out_of_the_round(tmp_path, store):
+    results_path = tmp_path / "results"
+    write_result(results_path, "a", score=100, submission_hash="a1")
+    write_result(results_path, "b", score=200, submission_hash="b1")
+
+    # b resubmitted but hasn't been rerun yet
+    write_round_manifest(str(results_path), "r2", {"a": "a1", "b": "b2"})
+    assert store.ingest(str(results_path), "r2") == 1
+    assert [r["upi"] for r in store.ranking("r2")] == ["a"]
+
+    write_result(results_path, "b", score=50, submission_hash="b2")
+    assert store.ingest(str(results_path), "r2") == 1
+    assert [(r["upi"], r["score"]) for r in store.ranking("r2")] == [("a", 100), ("b", 50)]
+
+
+def test_stored_result_is_dropped_when_the_round_moves_on_to_a_resubmission(tmp_path, store):
+    results_path = tmp_path / "results"
+    write_result(results_path, "a", score=100, submission_hash="a1")
+    write_round_manifest(str(results_path), "r1", {"a": "a1"})
+    store.ingest(str(results_path), "r1")
+
+    write_round_manifest(str(results_path), "r1", {"a": "a2"})
+    store.ingest(str(results_path), "r1")
+
+    assert store.ranking("r1") == []
+    assert store.aggregates("r1") == []
+
+
+def test_ranking_is_read_from_the_best_index(store):
+    plan = " ".join(
+        row["detail"]
+        for row in store.connection.execute(
+            "EXPLAIN QUERY PLAN SELECT upi FROM best WHERE round = ? ORDER BY world DESC, stage DESC, score DESC",
+            ("default",),
+        )
+    )
+    assert "best_rank" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_ingest_skips_results_with_missing_keys(tmp_path, store):
+    results_path = tmp_path / "results"
+    write_result(results_path, "abc123", score=100)
+    os.makedirs(results_path / "broken")
+    with open(results_path / "broken" / "results.json", "w", encoding="utf-8") as file:
+        json.dump({"world": 1}, file)
+
+    assert store.ingest(str(results_path)) == 1
+    assert [r["upi"] for r in store.ranking()] == ["abc123"]
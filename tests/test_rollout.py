@@ -0,0 +1,100 @@
+import time
+
+import numpy as np
+import pytest
+
+import rollout
+from rollout import LIFE_LOST, OUTCOME_SIZE, SCORE_DELTA, X_PROGRESS, RolloutPool, best_plan
+
+
+def fake_init_worker(press, release):
+    pass
+
+
+def fake_rollout(state, plan):
+    # A plan is [(value, seconds)] - the outcome records the state it was played from
+    value, seconds = plan[0]
+    time.sleep(seconds)
+    return np.array([len(state), 0, value], dtype=np.float32)
+
+
+@pytest.fixture
+def make_pool(monkeypatch):
+    # Forked workers see the patched module, so no emulator is loaded
+    monkeypatch.setattr(rollout, "_init_worker", fake_init_worker)
+    monkeypatch.setattr(rollout, "_rollout", fake_rollout)
+
+    pools = []
+
+    def make(workers):
+        pool = RolloutPool([], [], workers=workers, context="fork")
+        pools.append(pool)
+        return pool
+
+    yield make
+
+    for pool in pools:
+        pool.close()
+
+
+def outcome(x_progress, life_lost, score_delta):
+    row = np.zeros(OUTCOME_SIZE, dtype=np.float32)
+    row[[X_PROGRESS, LIFE_LOST, SCORE_DELTA]] = x_progress, life_lost, score_delta
+    return row
+
+
+def test_best_plan_prefers_survival_then_progress_then_score():
+    outcomes = np.stack(
+        [
+            outcome(50, 1, 900),
+            outcome(10, 0, 0),
+            outcome(20, 0, 100),
+            outcome(20, 0, 300),
+        ]
+    )
+
+    assert best_plan(outcomes) == 3
+
+
+def test_best_plan_ignores_unevaluated_plans():
+    outcomes = np.stack([outcome(10, 0, 0), outcome(20, 0, 0)])
+    outcomes[1] = np.nan
+
+    assert best_plan(outcomes) == 0
+
+
+def test_best_plan_is_none_when_nothing_was_evaluated():
+    outcomes = np.full((3, OUTCOME_SIZE), np.nan, dtype=np.float32)
+
+    assert best_plan(outcomes) is None
+
+
+def test_evaluate_returns_nan_for_plans_past_the_deadline(make_pool):
+    pool = make_pool(2)
+
+    outcomes = pool.evaluate(b"abc", [[(1, 0)], [(2, 1.0)], [(3, 0)]], deadline=0.5)
+
+    assert outcomes[0].tolist() == [3, 0, 1]
+    assert np.isnan(outcomes[1]).all()
+    assert outcomes[2].tolist() == [3, 0, 3]
+
+
+def test_late_results_are_not_used_for_the_next_decision(make_pool):
+    pool = make_pool(2)
+
+    # One worker is still playing this plan when the next decision starts
+    first = pool.evaluate(b"a", [[(1, 0.3)]], deadline=0.05)
+    assert np.isnan(first).all()
+
+    second = pool.evaluate(b"bb", [[(2, 0.5)]], deadline=1.0)
+    assert second[0].tolist() == [2, 0, 2]
+
+
+def test_workers_skip_plans_once_the_deadline_has_passed(make_pool):
+    pool = make_pool(1)
+
+    pool.evaluate(b"a", [[(1, 0.3)], [(2, 0.3)], [(3, 0.3)]], deadline=0.05)
+
+    # Only the plan that had already started holds the worker up
+    outcomes = pool.evaluate(b"bb", [[(4, 0)]], deadline=0.6)
+    assert outcomes[0].tolist() == [2, 0, 4]
@@ -0,0 +1,92 @@
+import os
+
+import pytest
+
+from submission_sync import EVALUATION_SCRIPTS, LocalSource, sync
+
+
+class CountingSource(LocalSource):
+    def __init__(self, root):
+        super().__init__(root)
+        self.fetched = []
+
+    def fetch(self, entry, destination):
+        self.fetched.append(entry["path"])
+        super().fetch(entry, destination)
+
+
+def write_file(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(text)
+
+
+@pytest.fixture
+def package_path(tmp_path):
+    package = tmp_path / "package"
+    for script in EVALUATION_SCRIPTS:
+        write_file(str(package / "scripts" / script), f"# {script}\n")
+    os.makedirs(package / "roms")
+    return str(package)
+
+
+def add_submission(source_path, upi, expert="# expert\n", requirements="numpy\n"):
+    write_file(f"{source_path}/{upi}/mario_expert.py", expert)
+    write_file(f"{source_path}/{upi}/requirements.txt", requirements)
+
+
+def test_sync_creates_isolated_workspaces(tmp_path, package_path):
+    source_path = str(tmp_path / "source")
+    add_submission(source_path, "abc123", expert="# abc\n")
+    add_submission(source_path, "xyz456", expert="# xyz\n")
+
+    workspaces = sync(LocalSource(source_path), str(tmp_path / "ws"), package_path=package_path)
+
+    assert sorted(workspaces) == ["abc123", "xyz456"]
+    for upi, workspace in workspaces.items():
+        with open(f"{workspace}/scripts/mario_expert.py", encoding="utf-8") as file:
+            assert file.read() == f"# {upi[:3]}\n"
+        for script in EVALUATION_SCRIPTS:
+            assert os.path.exists(f"{workspace}/scripts/{script}")
+        assert os.path.exists(f"{workspace}/requirements.txt")
+        assert os.path.realpath(f"{workspace}/results") == os.path.realpath(f"{package_path}/results")
+
+
+def test_sync_skips_unchanged_files(tmp_path, package_path):
+    source_path = str(tmp_path / "source")
+    add_submission(source_path, "abc123")
+
+    source = CountingSource(source_path)
+    sync(source, str(tmp_path / "ws"), package_path=package_path)
+    assert len(source.fetched) == 2
+
+    source = CountingSource(source_path)
+    sync(source, str(tmp_path / "ws"), package_path=package_path)
+    assert source.fetched == []
+
+    write_file(f"{source_path}/abc123/mario_expert.py", "# changed\n")
+    source = CountingSource(source_path)
+    sync(source, str(tmp_path / "ws"), package_path=package_path)
+    assert source.fetched == [f"{source_path}/abc123/mario_expert.py"]
+
+
+def test_sync_refetches_missing_workspace_files(tmp_path, package_path):
+    source_path = str(tmp_path / "source")
+    add_submission(source_path, "abc123")
+    sync(LocalSource(source_path), str(tmp_path / "ws"), package_path=package_path)
+
+    os.remove(tmp_path / "ws" / "abc123" / "scripts" / "mario_expert.py")
+
+    source = CountingSource(source_path)
+    sync(source, str(tmp_path / "ws"), package_path=package_path)
+    assert source.fetched == [f"{source_path}/abc123/mario_expert.py"]
+
+
+def test_sync_skips_incomplete_submissions(tmp_path, package_path):
+    source_path = str(tmp_path / "source")
+    add_submission(source_path, "abc123")
+    write_file(f"{source_path}/incomplete/mario_expert.py", "# expert\n")
+
+    workspaces = sync(LocalSource(source_path), str(tmp_path / "ws"), package_path=package_path)
+
+    assert list(workspaces) == ["abc123"]